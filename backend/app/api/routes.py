@@ -1,21 +1,76 @@
 """
 API路由定义
 """
-import io
+import asyncio
+import hashlib
+import multiprocessing
 import os
 import re
+import shutil
 import tempfile
+import time
+import traceback
+import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import FileResponse, StreamingResponse
-from typing import Optional
+from fastapi.responses import FileResponse, Response
+from typing import BinaryIO, Callable, Optional, TypeVar
 
 from app.models.schemas import ParseResponse, ParsedDocument, GenerateOutlineRequest
 from app.services.doc_parser import DocumentParser
 from app.services.xmind_generator import XMindGenerator
-from datetime import datetime
 
 router = APIRouter()
 
+T = TypeVar("T")
+
+# 上传文件大小上限（与nginx的client_max_body_size保持一致）
+MAX_UPLOAD_SIZE = 50 * 1024 * 1024
+UPLOAD_TOO_LARGE_MESSAGE = f"文件过大，请上传不超过{MAX_UPLOAD_SIZE // (1024 * 1024)}MB的Word文档"
+# 上传文件落盘时的分块大小（256 KB）
+UPLOAD_CHUNK_SIZE = 256 * 1024
+
+# ZIP文件头签名（.docx 本质是ZIP包）
+ZIP_SIGNATURE = b"PK\x03\x04"
+
+# 文档解析和XMind打包共用的进程池：都是纯Python的CPU密集操作，使用多进程才能同时利用多个CPU核
+# 提交的函数、参数、返回值和异常都需要可序列化（pickle），因此只提交模块级函数，文档以临时文件路径传递
+# 进程池在应用启动时创建（见 start_worker_pool），导入本模块不会启动任何进程
+# 每个工作进程都会加载lxml和python-docx，进程数默认限制为4，可通过环境变量 WORKER_PROCESSES 调整
+# （容器中 os.cpu_count() 返回的是宿主机核数，不能直接用作进程数）
+WORKER_COUNT = max(1, int(os.getenv("WORKER_PROCESSES", "4")))
+WORKER_CRASHED_MESSAGE = "处理进程异常退出，请稍后重试"
+_worker_pool: Optional[ProcessPoolExecutor] = None
+
+# .doc 转换会启动Word或LibreOffice，同一时间只转换一个文件
+DOC_CONVERT_CONCURRENCY = 1
+_doc_convert_semaphore: Optional[asyncio.Semaphore] = None
+
+# 限制同时进行的XMind打包数量：超出的请求在事件循环中排队，避免突发请求堆积大量待打包数据占满内存
+_xmind_semaphore: Optional[asyncio.Semaphore] = None
+
+# 已生成XMind文件的LRU缓存：解析数据内容哈希 -> XMind字节流（只在事件循环中访问，无需加锁）
+XMIND_CACHE_SIZE = 128
+_xmind_cache: "OrderedDict[str, bytes]" = OrderedDict()
+
+# 固定内容的失败响应（模块加载时创建一次，避免每次请求重复构造和校验）
+_RESP_BAD_TYPE = ParseResponse(success=False, message="不支持的文件类型，请上传Word文档（.doc或.docx）")
+_RESP_EMPTY_FILE = ParseResponse(success=False, message="上传的文件为空，请检查文件是否正确")
+
+# 错误信息清理用的正则（模块加载时预编译，避免每次调用重复解析）
+_RE_PKG_NOT_FOUND = re.compile(r"Package not found at ['\"][^'\"]+['\"]")
+_RE_AT_TEMP = re.compile(r"at ['\"][^'\"]*[Tt]emp[^'\"]*['\"]")
+_RE_WIN_PATH = re.compile(r"['\"][A-Za-z]:\\[^'\"]*['\"]")
+_RE_UNIX_PATH = re.compile(r"['\"]/[^'\"]*['\"]")
+_RE_TMPFILE = re.compile(r"tmp[a-z0-9_]+\.(docx?|zip)", re.IGNORECASE)
+_RE_WS = re.compile(r"\s+")
+_RE_LEAD_COLON = re.compile(r"^\s*[:：]\s*")
+_RE_LEAD_FAIL = re.compile(r"^\s*解析失败\s*[:：]\s*")
+# 下载文件名中无需URL编码的字符
+_RE_PLAIN_FILENAME = re.compile(r"[A-Za-z0-9._-]+")
+
 
 def sanitize_error_message(error_msg: str, filename: str) -> str:
     """
@@ -25,22 +80,22 @@ def sanitize_error_message(error_msg: str, filename: str) -> str:
     """
     # 移除临时路径（Windows和Unix路径）
     # 匹配类似 "Package not found at 'C:\Users\...\tmpyug_3_c4.docx'" 的模式
-    error_msg = re.sub(r"Package not found at ['\"][^'\"]+['\"]", "文件格式错误或文件已损坏", error_msg)
-    error_msg = re.sub(r"at ['\"][^'\"]*[Tt]emp[^'\"]*['\"]", "", error_msg)
-    error_msg = re.sub(r"['\"][A-Za-z]:\\[^'\"]*['\"]", "", error_msg)  # Windows绝对路径
-    error_msg = re.sub(r"['\"]/[^'\"]*['\"]", "", error_msg)  # Unix绝对路径
+    error_msg = _RE_PKG_NOT_FOUND.sub("文件格式错误或文件已损坏", error_msg)
+    error_msg = _RE_AT_TEMP.sub("", error_msg)
+    error_msg = _RE_WIN_PATH.sub("", error_msg)  # Windows绝对路径
+    error_msg = _RE_UNIX_PATH.sub("", error_msg)  # Unix绝对路径
     
     # 移除常见的临时文件路径模式
-    error_msg = re.sub(r"tmp[a-z0-9_]+\.(docx?|zip)", "", error_msg, flags=re.IGNORECASE)
+    error_msg = _RE_TMPFILE.sub("", error_msg)
     
     # 移除文件名（如果错误信息中已经包含，避免重复）
     if filename:
         error_msg = error_msg.replace(filename, "").strip()
     
     # 清理多余的空格和标点
-    error_msg = re.sub(r"\s+", " ", error_msg).strip()
-    error_msg = re.sub(r"^\s*[:：]\s*", "", error_msg)  # 移除开头的冒号
-    error_msg = re.sub(r"^\s*解析失败\s*[:：]\s*", "", error_msg)  # 移除开头的"解析失败："
+    error_msg = _RE_WS.sub(" ", error_msg).strip()
+    error_msg = _RE_LEAD_COLON.sub("", error_msg)  # 移除开头的冒号
+    error_msg = _RE_LEAD_FAIL.sub("", error_msg)  # 移除开头的"解析失败："
     
     # 如果错误信息为空或只包含技术细节，提供通用错误信息
     if not error_msg or len(error_msg) < 3:
@@ -53,29 +108,177 @@ def sanitize_error_message(error_msg: str, filename: str) -> str:
         return f"解析失败：{error_msg}"
 
 
+def _create_worker_pool() -> ProcessPoolExecutor:
+    """创建工作进程池"""
+    # 使用spawn启动工作进程：uvicorn进程中已有线程在运行，fork有死锁风险；Windows上本身也只支持spawn
+    return ProcessPoolExecutor(
+        max_workers=WORKER_COUNT,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def start_worker_pool():
+    """创建工作进程池和并发限制（应用启动时调用）"""
+    global _worker_pool, _doc_convert_semaphore, _xmind_semaphore
+    if _worker_pool is None:
+        _worker_pool = _create_worker_pool()
+    _doc_convert_semaphore = asyncio.Semaphore(DOC_CONVERT_CONCURRENCY)
+    _xmind_semaphore = asyncio.Semaphore(WORKER_COUNT)
+
+
+def shutdown_worker_pool():
+    """关闭工作进程池（应用关闭时调用）"""
+    global _worker_pool
+    if _worker_pool is not None:
+        _worker_pool.shutdown(wait=True, cancel_futures=True)
+        _worker_pool = None
+
+
+async def run_in_worker(func: Callable[..., T], *args) -> T:
+    """
+    在共享进程池中执行同步阻塞函数，避免阻塞事件循环
+    工作进程异常退出（内存不足被杀、原生库崩溃等）会使进程池永久不可用，此时重建进程池，后续请求不受影响
+    """
+    global _worker_pool
+    pool = _worker_pool
+    if pool is None:
+        raise RuntimeError("工作进程池未启动，请先调用 start_worker_pool()")
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(pool, func, *args)
+    except BrokenProcessPool:
+        # 并发请求可能同时发现进程池损坏，只重建一次
+        if _worker_pool is pool:
+            _worker_pool = _create_worker_pool()
+            pool.shutdown(wait=False)
+        raise ValueError(WORKER_CRASHED_MESSAGE) from None
+
+
+def save_upload_to_temp(src: BinaryIO, suffix: str) -> str:
+    """
+    将上传文件分块拷贝到临时文件，避免将整个文件读入内存
+    返回临时文件路径
+    """
+    # 临时文件只在本次请求内被解析器读取，关闭后即对后续open()可见，无需fsync持久化
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
+        shutil.copyfileobj(src, tmp_file, UPLOAD_CHUNK_SIZE)
+        return tmp_file.name
+
+
+def get_upload_size(src: BinaryIO) -> int:
+    """获取上传文件大小，并将读取位置重置到开头"""
+    src.seek(0, os.SEEK_END)
+    size = src.tell()
+    src.seek(0)
+    return size
+
+
+def has_zip_signature(src: BinaryIO) -> bool:
+    """检查文件头是否为ZIP签名，并将读取位置重置到开头"""
+    header = src.read(len(ZIP_SIGNATURE))
+    src.seek(0)
+    return header == ZIP_SIGNATURE
+
+
+def parse_document_file(doc_path: str) -> ParsedDocument:
+    """
+    解析Word文档（同步执行，供进程池调用）
+    部分异常（如lxml的XMLSyntaxError）无法序列化回主进程，统一转换为只带错误信息的ValueError
+    """
+    try:
+        parser = DocumentParser(doc_path)
+        return parser.parse()
+    except Exception as e:
+        raise ValueError(str(e)) from None
+
+
+def generate_xmind_bytes(parsed_doc: ParsedDocument) -> bytes:
+    """生成XMind文件字节流（同步执行，供进程池调用）"""
+    try:
+        return XMindGenerator(parsed_doc).generate()
+    except Exception as e:
+        raise ValueError(str(e)) from None
+
+
+def resolve_outline_name(parsed_doc: ParsedDocument) -> str:
+    """获取大纲名称：非建模需求取需求名称，建模需求取用例名称"""
+    if parsed_doc.document_type == "non_modeling":
+        return parsed_doc.requirement_name or "测试大纲"
+    return parsed_doc.requirement_info.case_name or "测试大纲"
+
+
+def build_content_disposition(filename: str) -> str:
+    """构建附件下载的Content-Disposition头，文件名按UTF-8进行URL编码，确保中文正确显示"""
+    # 只含安全ASCII字符的文件名无需编码
+    if _RE_PLAIN_FILENAME.fullmatch(filename):
+        encoded_filename = filename
+    else:
+        encoded_filename = urllib.parse.quote(filename, safe='')
+    return f"attachment; filename*=UTF-8''{encoded_filename}"
+
+
+def make_timestamp() -> str:
+    """生成文件名使用的时间戳（精确到秒）"""
+    return time.strftime("%Y%m%d_%H%M%S")
+
+
+async def render_xmind(parsed_doc: ParsedDocument) -> bytes:
+    """
+    生成XMind文件字节流（在进程池中打包，避免阻塞事件循环）
+    相同内容的解析数据直接返回缓存的结果，避免重复打包
+    """
+    key = hashlib.blake2b(parsed_doc.model_dump_json().encode('utf-8'), digest_size=16).hexdigest()
+    xmind_bytes = _xmind_cache.get(key)
+    if xmind_bytes is not None:
+        _xmind_cache.move_to_end(key)
+        return xmind_bytes
+    
+    async with _xmind_semaphore:
+        xmind_bytes = await run_in_worker(generate_xmind_bytes, parsed_doc)
+    
+    _xmind_cache[key] = xmind_bytes
+    _xmind_cache.move_to_end(key)
+    while len(_xmind_cache) > XMIND_CACHE_SIZE:
+        _xmind_cache.popitem(last=False)
+    return xmind_bytes
+
+
 @router.post("/parse-doc", response_model=ParseResponse)
 async def parse_document(file: UploadFile = File(...)):
     """
     上传并解析Word文档
     """
-    # 验证文件类型
-    if not file.filename.endswith(('.doc', '.docx')):
+    # 验证文件类型（不区分大小写）
+    filename_lower = file.filename.lower()
+    if not filename_lower.endswith(('.doc', '.docx')):
+        return _RESP_BAD_TYPE
+    
+    file_ext = '.doc' if filename_lower.endswith('.doc') else '.docx'
+    # 上传内容已由框架缓存在SpooledTemporaryFile中，直接检查大小
+    file_size = get_upload_size(file.file)
+    if file_size == 0:
+        return _RESP_EMPTY_FILE
+    if file_size > MAX_UPLOAD_SIZE:
+        # 与上传大小限制中间件保持一致：超过大小上限统一返回413
+        raise HTTPException(status_code=413, detail=UPLOAD_TOO_LARGE_MESSAGE)
+    # .docx 文件头不是ZIP签名时直接返回，无需调用python-docx
+    if file_ext == '.docx' and not has_zip_signature(file.file):
         return ParseResponse(
             success=False,
-            message="不支持的文件类型，请上传Word文档（.doc或.docx）"
+            message=f"{file.filename} 解析失败：文件格式错误或文件已损坏"
         )
     
-    # 保存临时文件（根据实际上传的文件类型保存）
-    file_ext = '.doc' if file.filename.endswith('.doc') else '.docx'
-    with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as tmp_file:
-        content = await file.read()
-        tmp_file.write(content)
-        tmp_path = tmp_file.name
-    
+    tmp_path = None
     try:
-        # 解析文档
-        parser = DocumentParser(tmp_path)
-        parsed_doc = parser.parse()
+        # 分块保存为临时文件（在线程池中落盘，避免阻塞事件循环），解析进程只接收文件路径，不在进程间传递文件内容
+        tmp_path = await asyncio.to_thread(save_upload_to_temp, file.file, file_ext)
+        
+        # 解析文档（加载、转换和解析都是同步阻塞操作，放到进程池中执行，避免阻塞事件循环）
+        if file_ext == '.doc':
+            async with _doc_convert_semaphore:
+                parsed_doc = await run_in_worker(parse_document_file, tmp_path)
+        else:
+            parsed_doc = await run_in_worker(parse_document_file, tmp_path)
         
         return ParseResponse(
             success=True,
@@ -98,8 +301,11 @@ async def parse_document(file: UploadFile = File(...)):
         )
     finally:
         # 清理临时文件
-        if os.path.exists(tmp_path):
-            os.unlink(tmp_path)
+        if tmp_path:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
 
 
 @router.post("/generate-outline")
@@ -108,26 +314,18 @@ async def generate_outline(request: GenerateOutlineRequest):
     生成XMind测试大纲
     """
     try:
-        # 生成XMind文件
-        generator = XMindGenerator(request.parsed_data)
-        xmind_bytes = generator.generate()
+        # 生成XMind文件（在进程池中打包，避免阻塞事件循环；相同内容命中缓存）
+        xmind_bytes = await render_xmind(request.parsed_data)
         
         # 生成文件名：统一格式为需求名称-时间戳
-        if request.parsed_data.document_type == "non_modeling":
-            requirement_name = request.parsed_data.requirement_name or "测试大纲"
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{requirement_name}-{timestamp}.xmind"
-        else:
-            case_name = request.parsed_data.requirement_info.case_name or "测试大纲"
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{case_name}-{timestamp}.xmind"
+        filename = f"{resolve_outline_name(request.parsed_data)}-{make_timestamp()}.xmind"
         
-        # 返回文件流
-        return StreamingResponse(
-            io.BytesIO(xmind_bytes),
+        # 返回文件内容（字节已在内存中，直接作为响应体发送）
+        return Response(
+            content=xmind_bytes,
             media_type="application/xmind",
             headers={
-                "Content-Disposition": f"attachment; filename={filename}"
+                "Content-Disposition": build_content_disposition(filename)
             }
         )
     except Exception as e:
@@ -140,35 +338,22 @@ async def generate_outline_from_json(parsed_data: ParsedDocument):
     从JSON数据生成XMind测试大纲（便捷接口）
     """
     try:
-        # 生成XMind文件
-        generator = XMindGenerator(parsed_data)
-        xmind_bytes = generator.generate()
+        # 生成XMind文件（在进程池中打包，避免阻塞事件循环；相同内容命中缓存）
+        xmind_bytes = await render_xmind(parsed_data)
         
         # 生成文件名：统一格式为需求名称-时间戳
-        if parsed_data.document_type == "non_modeling":
-            requirement_name = parsed_data.requirement_name or "测试大纲"
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{requirement_name}-{timestamp}.xmind"
-        else:
-            case_name = parsed_data.requirement_info.case_name or "测试大纲"
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{case_name}-{timestamp}.xmind"
-        
-        # 对文件名进行URL编码，确保中文正确显示
-        import urllib.parse
-        encoded_filename = urllib.parse.quote(filename.encode('utf-8'))
+        filename = f"{resolve_outline_name(parsed_data)}-{make_timestamp()}.xmind"
         
-        # 返回文件流
-        return StreamingResponse(
-            io.BytesIO(xmind_bytes),
+        # 返回文件内容（字节已在内存中，直接作为响应体发送）
+        return Response(
+            content=xmind_bytes,
             media_type="application/xmind",
             headers={
-                "Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}",
+                "Content-Disposition": build_content_disposition(filename),
                 "Content-Type": "application/xmind"
             }
         )
     except Exception as e:
-        import traceback
         error_detail = f"生成大纲失败：{str(e)}\n{traceback.format_exc()}"
         raise HTTPException(status_code=500, detail=error_detail)
 
@@ -2,7 +2,7 @@
 数据模型定义
 """
 from typing import List, Optional, Dict, Any
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class RequirementInfo(BaseModel):
@@ -39,40 +39,40 @@ class OutputElement(BaseModel):
 class StepInfo(BaseModel):
     """步骤信息"""
     name: str  # 步骤名称
-    input_elements: List[InputElement] = []  # 输入要素
-    output_elements: List[OutputElement] = []  # 输出要素
+    input_elements: List[InputElement] = Field(default_factory=list)  # 输入要素
+    output_elements: List[OutputElement] = Field(default_factory=list)  # 输出要素
 
 
 class TaskInfo(BaseModel):
     """任务信息"""
     name: str  # 任务名称
-    steps: List[StepInfo] = []  # 步骤列表
+    steps: List[StepInfo] = Field(default_factory=list)  # 步骤列表
 
 
 class ComponentInfo(BaseModel):
     """组件信息"""
     name: str  # 组件名称
-    tasks: List[TaskInfo] = []  # 任务列表
+    tasks: List[TaskInfo] = Field(default_factory=list)  # 任务列表
 
 
 class ActivityInfo(BaseModel):
     """活动信息"""
     name: str  # 活动名称
-    components: List[ComponentInfo] = []  # 组件列表
+    components: List[ComponentInfo] = Field(default_factory=list)  # 组件列表
 
 
 class FunctionInfo(BaseModel):
     """功能信息（用于非建模需求）"""
     name: str  # 功能名称
-    input_elements: List[InputElement] = []  # 输入要素
-    output_elements: List[OutputElement] = []  # 输出要素
+    input_elements: List[InputElement] = Field(default_factory=list)  # 输入要素
+    output_elements: List[OutputElement] = Field(default_factory=list)  # 输出要素
 
 
 class ParsedDocument(BaseModel):
     """解析后的文档数据"""
     version: str  # 版本编号
     requirement_info: RequirementInfo  # 需求用例基本信息
-    activities: List[ActivityInfo] = []  # 活动列表（建模需求）
+    activities: List[ActivityInfo] = Field(default_factory=list)  # 活动列表（建模需求）
     document_number: Optional[str] = None  # 需求说明书编号
     case_number: Optional[str] = None  # 需求用例编号
     # 非建模需求相关字段
@@ -81,7 +81,7 @@ class ParsedDocument(BaseModel):
     file_name: Optional[str] = None  # 文件名称
     requirement_name: Optional[str] = None  # 需求名称
     designer: Optional[str] = None  # 设计者
-    functions: List[FunctionInfo] = []  # 功能列表（非建模需求）
+    functions: List[FunctionInfo] = Field(default_factory=list)  # 功能列表（非建模需求）
 
 
 class ParseResponse(BaseModel):
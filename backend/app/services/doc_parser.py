@@ -3,6 +3,8 @@ Word文档解析服务 - 银行需求文档专用解析器
 """
 import re
 import os
+import platform
+import subprocess
 import tempfile
 from pathlib import Path
 from typing import List, Optional, Dict, Tuple
@@ -55,8 +57,6 @@ class DocumentParser:
         在Windows上使用pywin32 + Microsoft Word COM接口
         在Linux上使用LibreOffice命令行工具
         """
-        import platform
-        import subprocess
         
         # 创建临时 .docx 文件
         temp_dir = tempfile.gettempdir()
@@ -78,6 +78,7 @@ class DocumentParser:
     def _convert_doc_to_docx_windows(self, doc_path: str, output_path: str) -> str:
         """Windows下使用pywin32转换.doc文件"""
         try:
+            import pythoncom
             import win32com.client
         except ImportError:
             raise ValueError(
@@ -85,6 +86,8 @@ class DocumentParser:
                 "请运行: pip install pywin32"
             )
         
+        # 显式初始化当前线程的COM：进程池中解析在工作进程的主线程执行，成对调用保证在其他线程中调用时同样可用
+        pythoncom.CoInitialize()
         try:
             # 使用 Word COM 接口转换
             word_app = win32com.client.Dispatch("Word.Application")
@@ -125,10 +128,11 @@ class DocumentParser:
                 f"无法处理 .doc 格式文件：{str(e)}。"
                 "请确保已安装 Microsoft Word，或手动将文件转换为 .docx 格式。"
             )
+        finally:
+            pythoncom.CoUninitialize()
     
     def _convert_doc_to_docx_linux(self, doc_path: str, output_path: str) -> str:
         """Linux下使用LibreOffice转换.doc文件"""
-        import subprocess
         
         try:
             # 获取输出目录
@@ -248,10 +252,10 @@ class DocumentParser:
     
     def _cleanup_temp_file(self):
         """清理临时转换的 .docx 文件"""
-        if self._temp_docx_path and os.path.exists(self._temp_docx_path):
+        if self._temp_docx_path:
             try:
                 os.unlink(self._temp_docx_path)
-            except:
+            except OSError:
                 pass
             self._temp_docx_path = None
     
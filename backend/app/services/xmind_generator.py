@@ -2,42 +2,99 @@
 XMind文件生成服务 - 银行需求文档专用生成器
 """
 import io
+import itertools
+import re
+import uuid
 import zipfile
 import xml.etree.ElementTree as ET
 from datetime import datetime
-from typing import List
+from typing import BinaryIO, List
 from app.models.schemas import ParsedDocument, ActivityInfo, ComponentInfo, TaskInfo, StepInfo
 
 
+def _build_manifest_xml() -> str:
+    """创建manifest.xml内容"""
+    manifest = ET.Element('manifest', {
+        'xmlns': 'urn:xmind:xmap:xmlns:manifest:1.0'
+    })
+    
+    file_entry = ET.SubElement(manifest, 'file-entry', {
+        'full-path': 'content.xml',
+        'media-type': 'text/xml'
+    })
+    
+    file_entry2 = ET.SubElement(manifest, 'file-entry', {
+        'full-path': 'styles.xml',
+        'media-type': 'text/xml'
+    })
+    
+    file_entry3 = ET.SubElement(manifest, 'file-entry', {
+        'full-path': 'META-INF/',
+        'media-type': ''
+    })
+    
+    ET.indent(manifest, space='  ')
+    xml_str = ET.tostring(manifest, encoding='unicode', xml_declaration=True)
+    return xml_str
+
+
+def _build_styles_xml() -> str:
+    """创建styles.xml内容"""
+    styles = ET.Element('xmap-styles', {
+        'xmlns': 'urn:xmind:xmap:xmlns:style:2.0',
+        'version': '2.0'
+    })
+    
+    # 添加逻辑图向右的样式定义（如果需要）
+    # 某些XMind版本可能需要显式定义样式
+    
+    ET.indent(styles, space='  ')
+    xml_str = ET.tostring(styles, encoding='unicode', xml_declaration=True)
+    return xml_str
+
+
+# manifest.xml和styles.xml的内容固定不变，模块加载时生成一次，打包时直接写入
+_MANIFEST_XML_BYTES = _build_manifest_xml().encode('utf-8')
+_STYLES_XML_BYTES = _build_styles_xml().encode('utf-8')
+
+
 class XMindGenerator:
     """XMind文件生成器（直接生成XMind XML格式）"""
     
     def __init__(self, parsed_doc: ParsedDocument):
         self.parsed_doc = parsed_doc
+        # 节点ID只需在文件内唯一：随机前缀 + 自增计数，避免每个节点都调用一次uuid4
+        self._id_prefix = uuid.uuid4().hex[:18]
+        self._id_counter = itertools.count()
+    
+    def _next_id(self) -> str:
+        """生成下一个节点ID（26位十六进制）"""
+        return f"{self._id_prefix}{next(self._id_counter):08x}"
     
     def generate(self) -> bytes:
         """生成XMind文件并返回字节流"""
         # 创建内存中的ZIP文件
         zip_buffer = io.BytesIO()
-        
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            # 创建content.xml
-            content_xml = self._create_content_xml()
-            zip_file.writestr('content.xml', content_xml.encode('utf-8'))
+        self.generate_to(zip_buffer)
+        return zip_buffer.getvalue()
+    
+    def generate_to(self, fileobj: BinaryIO):
+        """将XMind文件（ZIP格式）写入可写的二进制文件对象"""
+        # XML重复度高，压缩级别1的压缩率与默认级别接近，但CPU开销小得多
+        with zipfile.ZipFile(fileobj, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as zip_file:
+            # 创建content.xml：直接序列化写入ZIP条目，不再生成中间字符串
+            content_tree = ET.ElementTree(self._create_content_xml())
+            with zip_file.open('content.xml', 'w') as content_file:
+                content_tree.write(content_file, encoding='utf-8', xml_declaration=True)
             
-            # 创建meta.xml
-            meta_xml = self._create_meta_xml()
-            zip_file.writestr('META-INF/manifest.xml', meta_xml.encode('utf-8'))
+            # 写入meta.xml（内容很小，直接存储不压缩）
+            zip_file.writestr('META-INF/manifest.xml', _MANIFEST_XML_BYTES, compress_type=zipfile.ZIP_STORED)
             
-            # 创建styles.xml（可选，用于样式）
-            styles_xml = self._create_styles_xml()
-            zip_file.writestr('styles.xml', styles_xml.encode('utf-8'))
-        
-        zip_buffer.seek(0)
-        return zip_buffer.getvalue()
+            # 写入styles.xml（可选，用于样式）
+            zip_file.writestr('styles.xml', _STYLES_XML_BYTES, compress_type=zipfile.ZIP_STORED)
     
-    def _create_content_xml(self) -> str:
-        """创建content.xml内容"""
+    def _create_content_xml(self) -> ET.Element:
+        """创建content.xml的根元素"""
         # 创建XML根元素
         root = ET.Element('xmap-content', {
             'xmlns': 'urn:xmind:xmap:xmlns:content:2.0',
@@ -45,10 +102,9 @@ class XMindGenerator:
             'version': '2.0'
         })
         
-        import uuid
-        sheet_id = uuid.uuid4().hex[:26]
+        sheet_id = self._next_id()
         sheet = ET.SubElement(root, 'sheet', {'id': sheet_id})
-        topic_id = uuid.uuid4().hex[:26]
+        topic_id = self._next_id()
         
         # 设置主题结构为逻辑图向右 - 作为topic元素的属性
         topic = ET.SubElement(sheet, 'topic', {
@@ -90,49 +146,8 @@ class XMindGenerator:
                                 component_topic = self._create_topic_element(topics_container, component.name)
                                 self._add_component(component_topic, component)
         
-        # 转换为XML字符串
-        ET.indent(root, space='  ')
-        xml_str = ET.tostring(root, encoding='unicode', xml_declaration=True)
-        return xml_str
-    
-    def _create_meta_xml(self) -> str:
-        """创建manifest.xml内容"""
-        manifest = ET.Element('manifest', {
-            'xmlns': 'urn:xmind:xmap:xmlns:manifest:1.0'
-        })
-        
-        file_entry = ET.SubElement(manifest, 'file-entry', {
-            'full-path': 'content.xml',
-            'media-type': 'text/xml'
-        })
-        
-        file_entry2 = ET.SubElement(manifest, 'file-entry', {
-            'full-path': 'styles.xml',
-            'media-type': 'text/xml'
-        })
-        
-        file_entry3 = ET.SubElement(manifest, 'file-entry', {
-            'full-path': 'META-INF/',
-            'media-type': ''
-        })
-        
-        ET.indent(manifest, space='  ')
-        xml_str = ET.tostring(manifest, encoding='unicode', xml_declaration=True)
-        return xml_str
-    
-    def _create_styles_xml(self) -> str:
-        """创建styles.xml内容"""
-        styles = ET.Element('xmap-styles', {
-            'xmlns': 'urn:xmind:xmap:xmlns:style:2.0',
-            'version': '2.0'
-        })
-        
-        # 添加逻辑图向右的样式定义（如果需要）
-        # 某些XMind版本可能需要显式定义样式
-        
-        ET.indent(styles, space='  ')
-        xml_str = ET.tostring(styles, encoding='unicode', xml_declaration=True)
-        return xml_str
+        # 不做缩进美化：XMind读取不依赖格式化，省去一次完整的树遍历
+        return root
     
     def _create_topic_element(self, parent, title_text: str) -> ET.Element:
         """创建主题元素
@@ -140,8 +155,7 @@ class XMindGenerator:
         parent应该是topics容器（type='attached'）
         返回创建的topic元素
         """
-        import uuid
-        topic_elem = ET.SubElement(parent, 'topic', {'id': uuid.uuid4().hex[:26]})
+        topic_elem = ET.SubElement(parent, 'topic', {'id': self._next_id()})
         title = ET.SubElement(topic_elem, 'title')
         # 确保文本不为None
         title.text = str(title_text) if title_text else ""
@@ -309,7 +323,6 @@ class XMindGenerator:
             # 处理换行符：将换行符转换为空格，多个连续空格合并为一个
             input_limit_cleaned = input_limit.replace('\n', ' ').replace('\r', ' ')
             # 清理多余的空格
-            import re
             input_limit_cleaned = re.sub(r'\s+', ' ', input_limit_cleaned).strip()
             return f"{field_name}-{required_text}；下拉选项包括：{input_limit_cleaned}"
         
@@ -1,17 +1,76 @@
 """
 FastAPI 主应用入口
 """
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
 from app.api import router
+from app.api.routes import MAX_UPLOAD_SIZE, UPLOAD_TOO_LARGE_MESSAGE, start_worker_pool, shutdown_worker_pool
+
+
+class UploadSizeLimitMiddleware:
+    """
+    根据Content-Length在读取请求体之前拒绝超大的上传请求（只检查上传接口，其他请求直接放行）
+    path 为上传接口在应用内的路由路径，匹配时去掉root_path挂载前缀和末尾的斜杠
+    """
+    
+    def __init__(self, app: ASGIApp, path: str, max_size: int):
+        self.app = app
+        self.path = path.rstrip("/")
+        self.max_size = max_size
+    
+    def _is_upload_request(self, scope: Scope) -> bool:
+        """判断请求是否为上传接口的POST请求"""
+        if scope["type"] != "http" or scope["method"] != "POST":
+            return False
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        return path.rstrip("/") == self.path
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if self._is_upload_request(scope):
+            content_length = Headers(scope=scope).get("content-length", "")
+            if content_length.isdigit() and int(content_length) > self.max_size:
+                response = JSONResponse(
+                    status_code=413,
+                    content={"detail": UPLOAD_TOO_LARGE_MESSAGE}
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时创建解析/打包工作进程池，关闭时回收"""
+    start_worker_pool()
+    yield
+    shutdown_worker_pool()
+
 
 app = FastAPI(
     title="测试大纲生成器",
     description="将Word格式需求文档转换为XMind格式的测试大纲",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
+)
+
+# 注册路由
+app.include_router(router, prefix="/api")
+
+# 上传大小限制：接口路径从已注册的路由解析，修改路由前缀时无需同步修改
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    path=app.url_path_for("parse_document"),
+    max_size=MAX_UPLOAD_SIZE,
 )
 
-# 配置CORS
+# 配置CORS（在上传大小限制之后注册，使413响应同样带有CORS头）
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # 生产环境应限制具体域名
@@ -20,9 +79,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 注册路由
-app.include_router(router, prefix="/api")
-
 @app.get("/")
 async def root():
     return {"message": "测试大纲生成器API服务运行中"}
@@ -0,0 +1,198 @@
+"""
+API接口回归测试
+"""
+import asyncio
+import io
+import os
+import urllib.parse
+import zipfile
+
+import docx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import routes
+from main import app
+
+
+# 解析结果示例：建模需求，用例名称为中文
+PARSED_DATA = {
+    "version": "V1.0",
+    "requirement_info": {"case_name": "贷款申请", "channel": "手机银行"},
+    "activities": [{
+        "name": "活动1",
+        "components": [{
+            "name": "组件1",
+            "tasks": [{
+                "name": "任务1",
+                "steps": [{
+                    "name": "步骤1",
+                    "input_elements": [{"index": 1, "field_name": "金额", "required": "是", "field_format": "文本框", "precision": "18,2"}],
+                    "output_elements": [{"index": 1, "field_name": "结果", "field_type": "字符"}]
+                }]
+            }]
+        }]
+    }]
+}
+
+
+def build_modeling_docx() -> bytes:
+    """构建一个可以解析成功的建模需求文档"""
+    document = docx.Document()
+    document.add_paragraph("用例版本控制信息")
+    table = document.add_table(rows=2, cols=2)
+    table.cell(0, 0).text = "版本"
+    table.cell(0, 1).text = "日期"
+    table.cell(1, 0).text = "V1.0"
+    table.cell(1, 1).text = "2024-01-01"
+    document.add_paragraph("需求用例概述（A阶段）")
+    table = document.add_table(rows=2, cols=2)
+    table.cell(0, 0).text = "用例名称"
+    table.cell(0, 1).text = "贷款申请"
+    table.cell(1, 0).text = "渠道（C）"
+    table.cell(1, 1).text = "手机银行"
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope="module")
+def client():
+    """启动应用（包括工作进程池），模块内的测试共用"""
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def upload(client: TestClient, filename: str, content: bytes):
+    """上传文档到解析接口"""
+    return client.post("/api/parse-doc", files={"file": (filename, content, "application/octet-stream")})
+
+
+# ========== 文件名与下载头 ==========
+
+@pytest.mark.parametrize("endpoint, body", [
+    ("/api/generate-outline", {"parsed_data": PARSED_DATA}),
+    ("/api/generate-outline-from-json", PARSED_DATA),
+])
+def test_generate_outline_with_chinese_name(client, endpoint, body):
+    """中文需求名称生成的文件名按UTF-8编码写入Content-Disposition，不再返回500"""
+    response = client.post(endpoint, json=body)
+    
+    assert response.status_code == 200
+    disposition = response.headers["content-disposition"]
+    prefix = "attachment; filename*=UTF-8''"
+    assert disposition.startswith(prefix)
+    filename = urllib.parse.unquote(disposition[len(prefix):])
+    assert filename.startswith("贷款申请-") and filename.endswith(".xmind")
+    
+    with zipfile.ZipFile(io.BytesIO(response.content)) as xmind_file:
+        assert set(xmind_file.namelist()) == {"content.xml", "META-INF/manifest.xml", "styles.xml"}
+        assert "贷款申请".encode("utf-8") in xmind_file.read("content.xml")
+
+
+def test_content_disposition_ascii_name_not_encoded():
+    """只含安全ASCII字符的文件名原样输出"""
+    assert routes.build_content_disposition("outline-1.xmind") == "attachment; filename*=UTF-8''outline-1.xmind"
+
+
+# ========== 上传校验 ==========
+
+def test_parse_doc_suffix_is_case_insensitive(client):
+    """大写扩展名的Word文档同样可以解析"""
+    response = upload(client, "REQUIREMENT.DOCX", build_modeling_docx())
+    
+    result = response.json()
+    assert response.status_code == 200
+    assert result["success"] is True
+    assert result["data"]["requirement_info"]["case_name"] == "贷款申请"
+
+
+def test_parse_doc_rejects_unsupported_type(client):
+    """非Word文档直接返回不支持的文件类型"""
+    result = upload(client, "requirement.pdf", b"%PDF-1.4").json()
+    
+    assert result["success"] is False
+    assert "不支持的文件类型" in result["message"]
+
+
+def test_parse_doc_rejects_docx_without_zip_signature(client):
+    """文件头不是ZIP签名的 .docx 文件不进入解析流程"""
+    result = upload(client, "broken.docx", b"not a zip file at all").json()
+    
+    assert result["success"] is False
+    assert result["message"] == "broken.docx 解析失败：文件格式错误或文件已损坏"
+
+
+def test_parse_doc_reports_malformed_xml_message(client):
+    """解析进程中无法序列化的异常（lxml）转换为原始错误信息返回"""
+    source = zipfile.ZipFile(io.BytesIO(build_modeling_docx()))
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as target:
+        for item in source.infolist():
+            data = source.read(item)
+            if item.filename == "word/document.xml":
+                data = b"<w:document><w:body/></w:document>"
+            target.writestr(item, data)
+    
+    result = upload(client, "malformed.docx", buffer.getvalue()).json()
+    
+    assert result["success"] is False
+    assert "Namespace prefix w" in result["message"]
+    assert "pickle" not in result["message"]
+
+
+# ========== 上传大小限制 ==========
+
+OVERSIZED_HEADERS = {
+    "content-length": str(routes.MAX_UPLOAD_SIZE + 1),
+    "content-type": "multipart/form-data; boundary=boundary",
+    "origin": "http://localhost:3000",
+}
+
+
+@pytest.mark.parametrize("path", ["/api/parse-doc", "/api/parse-doc/"])
+def test_oversized_upload_rejected_by_content_length(client, path):
+    """Content-Length超过上限时，在读取请求体之前返回413，且带有CORS头"""
+    response = client.post(path, content=b"x", headers=OVERSIZED_HEADERS)
+    
+    assert response.status_code == 413
+    assert response.json() == {"detail": routes.UPLOAD_TOO_LARGE_MESSAGE}
+    assert response.headers["access-control-allow-origin"] == OVERSIZED_HEADERS["origin"]
+
+
+def test_oversized_upload_rejected_under_root_path():
+    """应用挂载在root_path下时同样拒绝超大上传"""
+    # 请求在中间件中即被拒绝，无需启动应用生命周期（避免关闭共用的工作进程池）
+    mounted_client = TestClient(app, root_path="/backend")
+    response = mounted_client.post("/backend/api/parse-doc", content=b"x", headers=OVERSIZED_HEADERS)
+    
+    assert response.status_code == 413
+
+
+def test_oversized_upload_rejected_by_handler(client, monkeypatch):
+    """没有Content-Length（如分块上传）时，接口读取后同样返回413"""
+    monkeypatch.setattr(routes, "MAX_UPLOAD_SIZE", 16)
+    
+    response = upload(client, "large.docx", routes.ZIP_SIGNATURE + b"x" * 64)
+    
+    assert response.status_code == 413
+    assert response.json() == {"detail": routes.UPLOAD_TOO_LARGE_MESSAGE}
+
+
+def test_size_limit_only_applies_to_upload(client):
+    """其他接口不受上传大小限制中间件影响"""
+    response = client.post("/api/generate-outline", content=b"x", headers=OVERSIZED_HEADERS)
+    
+    assert response.status_code != 413
+
+
+# ========== 工作进程池 ==========
+
+def test_worker_pool_recovers_after_worker_crash(client):
+    """工作进程异常退出后重建进程池，后续请求正常处理"""
+    with pytest.raises(ValueError, match=routes.WORKER_CRASHED_MESSAGE):
+        asyncio.run(routes.run_in_worker(os._exit, 1))
+    
+    result = upload(client, "requirement.docx", build_modeling_docx()).json()
+    
+    assert result["success"] is True